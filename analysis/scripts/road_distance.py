@@ -0,0 +1,348 @@
+"""
+Offline road-network distance engine for the road_dist_to_* and
+haversine_dist_to_* tract features used by HDB_And_Kmeans_GNN.ipynb.
+
+1. ``build_graph`` turns a local OSM PBF extract into a compact CSR road
+   graph (node ids renumbered 0..n-1, edge weights in km) saved as .npz.
+   Components under ``min_component_nodes`` (isolated service roads,
+   parking aisles) are dropped; real separate networks such as islands
+   are kept and labelled.
+2. ``snap_region`` snaps tract centroids and facilities onto a region's
+   graph once: each point links to the nearest node of every component
+   within ``max_snap_km``, and points further than that from any road
+   are left out (NaN) rather than given an invented distance.
+3. ``type_distances`` runs one multi-source Dijkstra for one facility
+   type over those snaps: every facility of the type hangs off a virtual
+   source node, so a single pass gives each tract its nearest network
+   distance.
+4. ``compute_distances`` snaps every region in a process pool, fans each
+   region's per-type passes out to the same pool and keeps the minimum
+   over regions for each tract.
+
+Usage:
+    python road_distance.py tracts_parquet healthcare_facilities_USA.geojson \\
+        --pbf arizona-latest.osm.pbf california-latest.osm.pbf -o road_distances.csv
+"""
+import argparse
+import os
+from array import array
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import lru_cache
+
+import geopandas as gpd
+import numpy as np
+import osmium
+import pandas as pd
+from scipy import sparse
+from scipy.sparse.csgraph import connected_components, dijkstra
+from sklearn.neighbors import BallTree
+
+from tract_ingest import read_centroids
+
+# ──────────────────────────────────────────────────────
+# Constants
+# ──────────────────────────────────────────────────────
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEG = EARTH_RADIUS_KM * np.pi / 180
+MIN_EDGE_KM = 1e-6          # csgraph drops explicit zeros, keep every edge positive
+GRAPH_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "road_graphs")
+GRAPH_VERSION = 3           # bump when the saved graph format or contents change
+MIN_COMPONENT_NODES = 50    # smaller road fragments are dropped
+MAX_SNAP_KM = 5.0           # points further than this from every road get no distance
+
+FACILITY_TYPES = ["hospital", "clinic", "doctors", "pharmacy", "dentist", "nursing_home", "social_facility"]
+
+# Drivable/walkable highway classes; paths, tracks and construction are skipped
+ROAD_CLASSES = {
+    "motorway", "motorway_link", "trunk", "trunk_link", "primary", "primary_link",
+    "secondary", "secondary_link", "tertiary", "tertiary_link", "unclassified",
+    "residential", "living_street", "service", "road",
+}
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+
+# ──────────────────────────────────────────────────────
+# Graph construction
+# ──────────────────────────────────────────────────────
+class RoadHandler(osmium.SimpleHandler):
+    """
+    Collects consecutive node pairs of every road way, plus each visited
+    node's location, in typed arrays rather than Python lists and dicts.
+    Nodes shared by several ways repeat; build_graph dedupes them.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.src, self.dst = array("q"), array("q")
+        self.node_ids, self.node_lat, self.node_lon = array("q"), array("d"), array("d")
+
+    def way(self, w):
+        if w.tags.get("highway") not in ROAD_CLASSES:
+            return
+        prev = None
+        for n in w.nodes:
+            if not n.location.valid():
+                prev = None
+                continue
+            self.node_ids.append(n.ref)
+            self.node_lat.append(n.location.lat)
+            self.node_lon.append(n.location.lon)
+            if prev is not None:
+                self.src.append(prev)
+                self.dst.append(n.ref)
+            prev = n.ref
+
+
+def build_graph(pbf_path: str, out_path: str, min_component_nodes: int = MIN_COMPONENT_NODES) -> str:
+    """
+    Parse road ways from ``pbf_path`` and save an undirected CSR graph to
+    ``out_path`` (.npz with indptr/indices/data, node lat/lon and each
+    node's connected-component label).
+    """
+    handler = RoadHandler()
+    handler.apply_file(pbf_path, locations=True)
+
+    # Sorted unique node ids; their index is the graph node number
+    osm_ids, first = np.unique(np.frombuffer(handler.node_ids, dtype=np.int64), return_index=True)
+    latlon = np.column_stack([np.frombuffer(handler.node_lat, dtype=np.float64)[first],
+                              np.frombuffer(handler.node_lon, dtype=np.float64)[first]])
+
+    u = np.searchsorted(osm_ids, np.frombuffer(handler.src, dtype=np.int64))
+    v = np.searchsorted(osm_ids, np.frombuffer(handler.dst, dtype=np.int64))
+    w = np.maximum(haversine_km(latlon[u, 0], latlon[u, 1], latlon[v, 0], latlon[v, 1]), MIN_EDGE_KM)
+
+    # Store each undirected edge once; csr_matrix would sum duplicates, keep the shortest
+    lo, hi = np.minimum(u, v), np.maximum(u, v)
+    edges = pd.DataFrame({"u": lo, "v": hi, "w": w})
+    edges = edges[edges["u"] != edges["v"]].groupby(["u", "v"], as_index=False)["w"].min()
+
+    n = len(osm_ids)
+    graph = sparse.csr_matrix((edges["w"].values, (edges["u"].values, edges["v"].values)), shape=(n, n))
+
+    # Drop small fragments (parking aisles, unconnected service roads) but keep
+    # every real network, e.g. each island; the largest one is always kept
+    component = np.zeros(n, dtype=np.int64)
+    if n:
+        _, labels = connected_components(graph, directed=False)
+        sizes = np.bincount(labels)
+        keep = (sizes[labels] >= min_component_nodes) | (labels == sizes.argmax())
+        graph, latlon = graph[keep][:, keep].tocsr(), latlon[keep]
+        component = np.unique(labels[keep], return_inverse=True)[1]
+
+    os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
+    np.savez_compressed(out_path, indptr=graph.indptr, indices=graph.indices, data=graph.data,
+                        lat=latlon[:, 0], lon=latlon[:, 1], component=component,
+                        version=GRAPH_VERSION, min_component_nodes=min_component_nodes)
+    return out_path
+
+
+def graph_is_current(graph_path: str, pbf_path: str, min_component_nodes: int = MIN_COMPONENT_NODES) -> bool:
+    """True if ``graph_path`` was built from the current PBF with the current format and settings."""
+    if not os.path.exists(graph_path) or os.path.getmtime(graph_path) < os.path.getmtime(pbf_path):
+        return False
+    z = np.load(graph_path)
+    return ("version" in z.files and int(z["version"]) == GRAPH_VERSION
+            and int(z["min_component_nodes"]) == min_component_nodes)
+
+
+def load_graph(path: str):
+    """Return (csr graph, node lat, node lon, node component) from a file written by ``build_graph``."""
+    z = np.load(path)
+    n = len(z["lat"])
+    graph = sparse.csr_matrix((z["data"], z["indices"], z["indptr"]), shape=(n, n))
+    return graph, z["lat"], z["lon"], z["component"]
+
+
+# Per-process copy, so a worker running several types of one region loads it once
+_load_graph_cached = lru_cache(maxsize=1)(load_graph)
+
+
+# ──────────────────────────────────────────────────────
+# Distance passes
+# ──────────────────────────────────────────────────────
+def snap(node_lat, node_lon, component, lat, lon, max_snap_km: float = MAX_SNAP_KM):
+    """
+    Link each point to the nearest node of every component within
+    ``max_snap_km``. Returns flat (point index, node, snap distance km)
+    arrays; points with no road that close do not appear.
+    """
+    lat, lon = np.asarray(lat, dtype=float), np.asarray(lon, dtype=float)
+    points = np.radians(np.column_stack([lat, lon]))
+    order = np.argsort(component, kind="stable")
+    groups = np.split(order, np.cumsum(np.bincount(component))[:-1])
+
+    rows, nodes, dists = [], [], []
+    for members in groups:
+        mlat, mlon = node_lat[members], node_lon[members]
+        # Bounding-box prefilter so small components only query nearby points
+        lat_pad = max_snap_km / KM_PER_DEG
+        lon_pad = lat_pad / max(np.cos(np.radians(min(np.abs(mlat).max() + lat_pad, 89.0))), 1e-3)
+        cand = np.flatnonzero((lat >= mlat.min() - lat_pad) & (lat <= mlat.max() + lat_pad)
+                              & (lon >= mlon.min() - lon_pad) & (lon <= mlon.max() + lon_pad))
+        if not len(cand):
+            continue
+        tree = BallTree(np.radians(np.column_stack([mlat, mlon])), metric="haversine")
+        dist, idx = tree.query(points[cand], k=1)
+        dist = dist[:, 0] * EARTH_RADIUS_KM
+        ok = dist <= max_snap_km
+        rows.append(cand[ok])
+        nodes.append(members[idx[ok, 0]])
+        dists.append(dist[ok])
+
+    if not rows:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0)
+    return np.concatenate(rows), np.concatenate(nodes), np.concatenate(dists)
+
+
+def multi_source_distances(graph: sparse.csr_matrix, source_nodes, source_offsets, target_nodes) -> np.ndarray:
+    """
+    Shortest network distance from the nearest source to each target
+    node in one Dijkstra pass. Every source hangs off a virtual node
+    with an edge of its offset (the facility's snap distance).
+    """
+    n = graph.shape[0]
+    links = pd.DataFrame({"node": source_nodes, "w": np.maximum(source_offsets, MIN_EDGE_KM)})
+    links = links.groupby("node", as_index=False)["w"].min()
+    virtual = sparse.csr_matrix(
+        (links["w"].values, (np.full(len(links), n), links["node"].values)), shape=(n + 1, n + 1)
+    )
+    extended = sparse.block_diag([graph, sparse.csr_matrix((1, 1))], format="csr") + virtual
+    return dijkstra(extended, directed=False, indices=n)[target_nodes]
+
+
+def snap_region(graph_path: str, tracts: pd.DataFrame, facilities: pd.DataFrame,
+                max_snap_km: float = MAX_SNAP_KM) -> dict:
+    """
+    Snap tract centroids and facilities onto one region's graph, once for
+    all facility types. Returns the flat arrays from ``snap`` for both,
+    with each facility link's amenity.
+    """
+    _, node_lat, node_lon, component = _load_graph_cached(graph_path)
+    empty = np.empty(0, dtype=np.int64)
+    snapped = {"tract_rows": empty, "tract_nodes": empty, "tract_snap": np.empty(0),
+               "fac_nodes": empty, "fac_snap": np.empty(0), "fac_amenity": np.empty(0, dtype=object)}
+    if len(node_lat) == 0:
+        return snapped
+
+    snapped["tract_rows"], snapped["tract_nodes"], snapped["tract_snap"] = snap(
+        node_lat, node_lon, component, tracts["lat"].values, tracts["lon"].values, max_snap_km)
+    fac_rows, snapped["fac_nodes"], snapped["fac_snap"] = snap(
+        node_lat, node_lon, component, facilities["lat"].values, facilities["lon"].values, max_snap_km)
+    snapped["fac_amenity"] = facilities["amenity"].values[fac_rows]
+    return snapped
+
+
+def type_distances(graph_path: str, snapped: dict, facility_type: str, n_tracts: int) -> np.ndarray:
+    """
+    Network distance (km) from each tract centroid to its nearest
+    ``facility_type`` over one region's graph, snap distances included,
+    in one Dijkstra pass. A tract linked to several components takes the
+    best of them. Tracts off the region's roads or unreachable get inf.
+    """
+    result = np.full(n_tracts, np.inf)
+    sel = snapped["fac_amenity"] == facility_type
+    if not sel.any() or not len(snapped["tract_rows"]):
+        return result
+    graph = _load_graph_cached(graph_path)[0]
+    dist = multi_source_distances(graph, snapped["fac_nodes"][sel], snapped["fac_snap"][sel],
+                                  snapped["tract_nodes"]) + snapped["tract_snap"]
+    np.minimum.at(result, snapped["tract_rows"], dist)
+    return result
+
+
+def haversine_nearest(tracts: pd.DataFrame, facilities: pd.DataFrame) -> np.ndarray:
+    """Straight-line distance (km) from each tract centroid to its nearest facility."""
+    if facilities.empty:
+        return np.full(len(tracts), np.nan)
+    tree = BallTree(np.radians(facilities[["lat", "lon"]].values), metric="haversine")
+    dist, _ = tree.query(np.radians(tracts[["lat", "lon"]].values), k=1)
+    return dist[:, 0] * EARTH_RADIUS_KM
+
+
+def compute_distances(tracts: pd.DataFrame, facilities: pd.DataFrame, graph_paths: list,
+                      facility_types=FACILITY_TYPES, workers=None, max_snap_km: float = MAX_SNAP_KM) -> pd.DataFrame:
+    """
+    GEOID-keyed road_dist_to_<type> and haversine_dist_to_<type> columns
+    (km). ``tracts`` needs GEOID/lat/lon, ``facilities`` amenity/lat/lon.
+    Regions are snapped in parallel and every (region, type) Dijkstra
+    pass is its own pool task. Tracts with no road within ``max_snap_km``
+    in any region get NaN road distances.
+    """
+    tracts = tracts[["GEOID", "lat", "lon"]].reset_index(drop=True)
+    facilities = facilities[facilities["amenity"].isin(facility_types)].reset_index(drop=True)
+    out = pd.DataFrame({"GEOID": tracts["GEOID"].astype(str)})
+    road = {t: np.full(len(tracts), np.inf) for t in facility_types}
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # Snap each region once, then fan its per-type passes out as they become ready
+        snaps = {pool.submit(snap_region, graph_path, tracts, facilities, max_snap_km): graph_path
+                 for graph_path in graph_paths}
+        passes = {}
+        for future in as_completed(snaps):
+            snapped = future.result()
+            for facility_type in np.unique(snapped["fac_amenity"]):
+                task = pool.submit(type_distances, snaps[future], snapped, facility_type, len(tracts))
+                passes[task] = facility_type
+        for future in as_completed(passes):
+            facility_type = passes[future]
+            road[facility_type] = np.minimum(road[facility_type], future.result())
+
+    for facility_type in facility_types:
+        fac = facilities.loc[facilities["amenity"] == facility_type, ["lat", "lon"]]
+        out[f"road_dist_to_{facility_type}"] = np.where(np.isinf(road[facility_type]), np.nan, road[facility_type])
+        out[f"haversine_dist_to_{facility_type}"] = haversine_nearest(tracts, fac)
+    return out
+
+
+def load_facilities(path: str) -> pd.DataFrame:
+    """Facility points (amenity, lat, lon) from the healthcare_facilities_USA.geojson export."""
+    fac = gpd.read_file(path).to_crs(epsg=4326)
+    return pd.DataFrame({"amenity": fac["amenity"].values, "lat": fac.geometry.y.values, "lon": fac.geometry.x.values})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Nearest road-network distance from tracts to facilities.")
+    parser.add_argument("tracts", help="Partitioned tract dataset written by tract_ingest.py")
+    parser.add_argument("facilities", help="Facility GeoJSON with an 'amenity' column")
+    parser.add_argument("--pbf", nargs="+", required=True, help="OSM PBF extracts, one per region")
+    parser.add_argument("--states", nargs="*", help="State FIPS codes to load (default: all)")
+    parser.add_argument("--types", nargs="*", default=FACILITY_TYPES, help="Facility types to compute")
+    parser.add_argument("--graph-dir", default=GRAPH_DIR, help="Where compiled road graphs are cached")
+    parser.add_argument("--max-snap-km", type=float, default=MAX_SNAP_KM,
+                        help="Furthest a tract or facility may be from a road to be snapped onto it")
+    parser.add_argument("--min-component-nodes", type=int, default=MIN_COMPONENT_NODES,
+                        help="Road components with fewer nodes are dropped")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("-o", "--output", default="road_distances.csv")
+    args = parser.parse_args()
+
+    # Build (or reuse) one compact graph per region in parallel
+    graph_paths = {}
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futures = {}
+        for pbf in args.pbf:
+            name = os.path.basename(pbf).split(".")[0]
+            out_path = os.path.join(args.graph_dir, f"{name}.npz")
+            if graph_is_current(out_path, pbf, args.min_component_nodes):
+                graph_paths[name] = out_path
+            else:
+                futures[pool.submit(build_graph, pbf, out_path, args.min_component_nodes)] = name
+        for future in as_completed(futures):
+            graph_paths[futures[future]] = future.result()
+            print(f"Built road graph for {futures[future]}")
+
+    tracts = read_centroids(args.tracts, args.states)
+    facilities = load_facilities(args.facilities)
+    result = compute_distances(tracts, facilities, list(graph_paths.values()), args.types, args.workers,
+                               args.max_snap_km)
+    result.to_csv(args.output, index=False)
+    print(f"Wrote {len(result):,} tracts to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
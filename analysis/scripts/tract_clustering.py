@@ -0,0 +1,259 @@
+"""
+Tract clustering stage.
+
+Replaces the ad-hoc cells in HDB_And_Kmeans_GNN.ipynb and
+clustering_with_E2SFCA.ipynb:
+
+* the neighbour graph is a BallTree KNN on haversine distance (not
+  Euclidean on raw degrees), stored as a sparse CSR matrix in km;
+* UMAP / GAE embeddings are cached on disk, keyed by the feature set,
+  the parameters and a fingerprint of the input data;
+* MiniBatchKMeans k-sweeps run in parallel, scored on a sample;
+* cluster labels are written to a GEOID-keyed CSV that the dashboard
+  data loader merges onto the tracts.
+
+Usage:
+    python tract_clustering.py final_df.csv --embedding umap --k 4 5 6 7 8
+"""
+import argparse
+import hashlib
+import json
+import os
+from functools import partial
+
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed
+from scipy import sparse
+from sklearn.cluster import HDBSCAN, MiniBatchKMeans
+from sklearn.metrics import calinski_harabasz_score, silhouette_score
+from sklearn.neighbors import BallTree
+from sklearn.preprocessing import StandardScaler
+
+# ──────────────────────────────────────────────────────
+# Constants
+# ──────────────────────────────────────────────────────
+EARTH_RADIUS_KM = 6371.0088
+RANDOM_STATE = 42
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.path.join(SCRIPT_DIR, "cache", "embeddings")
+LABELS_PATH = os.path.join(SCRIPT_DIR, "..", "..", "healthcare_application", "data", "tract_clusters.csv")
+
+SOCIO_COLUMNS = [
+    "Total_Population", "Median_Household_Income", "Uninsured_Rate",
+    "Rent_as_Income_Percentage", "Limited_English_Proficiency_Rate",
+    "No_Vehicle_Rate", "No_Internet_Rate",
+]
+
+
+def default_feature_columns(df: pd.DataFrame, distance_prefix: str = "road_dist_to_") -> list:
+    """Socio-economic, *_CrudePrev and distance columns, as used in the GNN notebook."""
+    health_columns = [c for c in df.columns if "_CrudePrev" in c]
+    distance_columns = [c for c in df.columns if c.startswith(distance_prefix)]
+    return [c for c in SOCIO_COLUMNS if c in df.columns] + health_columns + distance_columns
+
+
+# ──────────────────────────────────────────────────────
+# Neighbour graph
+# ──────────────────────────────────────────────────────
+def haversine_knn_graph(lat, lon, k: int = 5) -> sparse.csr_matrix:
+    """
+    Directed k-nearest-neighbour graph over tract centroids. Entry (i, j)
+    holds the great-circle distance in km from tract i to neighbour j.
+    """
+    coords = np.radians(np.column_stack([lat, lon]).astype(float))
+    tree = BallTree(coords, metric="haversine")
+    dist, idx = tree.query(coords, k=k + 1)     # first hit is the point itself
+
+    n = len(coords)
+    rows = np.repeat(np.arange(n), k)
+    cols = idx[:, 1:].ravel()
+    data = dist[:, 1:].ravel() * EARTH_RADIUS_KM
+    return sparse.csr_matrix((data, (rows, cols)), shape=(n, n))
+
+
+def save_graph(graph: sparse.csr_matrix, path: str):
+    sparse.save_npz(path, graph)
+
+
+def load_graph(path: str) -> sparse.csr_matrix:
+    return sparse.load_npz(path).tocsr()
+
+
+# ──────────────────────────────────────────────────────
+# Embedding cache
+# ──────────────────────────────────────────────────────
+def graph_fingerprint(graph: sparse.csr_matrix) -> str:
+    """Content hash of a sparse graph, so cached embeddings follow graph changes."""
+    h = hashlib.sha1()
+    h.update(np.asarray(graph.shape, dtype=np.int64).tobytes())
+    for arr in (graph.indptr, graph.indices, graph.data):
+        h.update(np.ascontiguousarray(arr).tobytes())
+    return h.hexdigest()
+
+
+def embedding_key(method: str, feature_cols: list, X: np.ndarray, params: dict, extra: str = "") -> str:
+    """
+    Stable key from the method, feature set, parameters and data
+    fingerprint. ``extra`` carries inputs that are not in X, such as the
+    graph fingerprint for GAE.
+    """
+    h = hashlib.sha1()
+    h.update(json.dumps({"method": method, "features": list(feature_cols), "params": params,
+                         "extra": extra}, sort_keys=True).encode("utf-8"))
+    h.update(np.ascontiguousarray(X, dtype=np.float32).tobytes())
+    return f"{method}_{h.hexdigest()[:16]}"
+
+
+def cached_embedding(method: str, feature_cols: list, X: np.ndarray, params: dict,
+                     compute, cache_dir: str = CACHE_DIR, extra: str = "") -> np.ndarray:
+    """Return the cached embedding for this key, computing and storing it on a miss."""
+    os.makedirs(cache_dir, exist_ok=True)
+    path = os.path.join(cache_dir, embedding_key(method, feature_cols, X, params, extra) + ".npy")
+    if os.path.exists(path):
+        return np.load(path)
+    emb = compute(X, **params)
+    np.save(path, emb)
+    return emb
+
+
+def compute_umap(X: np.ndarray, n_neighbors: int = 15, min_dist: float = 0.1,
+                 n_components: int = 2) -> np.ndarray:
+    import umap
+
+    reducer = umap.UMAP(n_neighbors=n_neighbors, min_dist=min_dist,
+                        n_components=n_components, random_state=RANDOM_STATE)
+    return reducer.fit_transform(X)
+
+
+def compute_gae(X: np.ndarray, graph_path: str, out_channels: int = 16,
+                epochs: int = 200, lr: float = 0.01) -> np.ndarray:
+    """Graph auto-encoder embedding over the saved haversine KNN graph."""
+    import torch
+    import torch.nn as nn
+    from torch_geometric.nn import GAE, GCNConv
+    from torch_geometric.utils import to_undirected
+
+    class GCNEncoder(nn.Module):
+        def __init__(self, in_channels, out_channels, dropout=0.5):
+            super().__init__()
+            self.conv1 = GCNConv(in_channels, 2 * out_channels)
+            self.conv2 = GCNConv(2 * out_channels, out_channels)
+            self.dropout = nn.Dropout(dropout)
+
+        def forward(self, x, edge_index):
+            x = self.dropout(torch.relu(self.conv1(x, edge_index)))
+            return self.conv2(x, edge_index)
+
+    torch.manual_seed(RANDOM_STATE)
+    coo = load_graph(graph_path).tocoo()
+    edge_index = to_undirected(torch.tensor(np.vstack([coo.row, coo.col]), dtype=torch.long))
+    x = torch.tensor(X, dtype=torch.float)
+
+    model = GAE(GCNEncoder(x.shape[1], out_channels))
+    optimizer = torch.optim.Adam(model.parameters(), lr=lr)
+    for _ in range(epochs):
+        model.train()
+        optimizer.zero_grad()
+        z = model.encode(x, edge_index)
+        loss = model.recon_loss(z, edge_index)
+        loss.backward()
+        optimizer.step()
+
+    model.eval()
+    with torch.no_grad():
+        return model.encode(x, edge_index).cpu().numpy()
+
+
+# ──────────────────────────────────────────────────────
+# Clustering
+# ──────────────────────────────────────────────────────
+def _score_k(X: np.ndarray, k: int, sample_size: int, batch_size: int) -> dict:
+    model = MiniBatchKMeans(n_clusters=k, batch_size=batch_size, n_init=3, random_state=RANDOM_STATE)
+    labels = model.fit_predict(X)
+
+    rng = np.random.default_rng(RANDOM_STATE)
+    sample = rng.choice(len(X), size=min(sample_size, len(X)), replace=False)
+    return {
+        "k": k,
+        "inertia": model.inertia_,
+        "silhouette": silhouette_score(X[sample], labels[sample]),
+        "calinski_harabasz": calinski_harabasz_score(X[sample], labels[sample]),
+    }
+
+
+def kmeans_sweep(X: np.ndarray, ks, sample_size: int = 10_000, batch_size: int = 4096,
+                 n_jobs: int = -1) -> pd.DataFrame:
+    """Fit MiniBatchKMeans for each k in parallel and score each on a random sample."""
+    scores = Parallel(n_jobs=n_jobs)(delayed(_score_k)(X, k, sample_size, batch_size) for k in ks)
+    return pd.DataFrame(scores).sort_values("k").reset_index(drop=True)
+
+
+def fit_kmeans(X: np.ndarray, k: int, batch_size: int = 4096) -> np.ndarray:
+    model = MiniBatchKMeans(n_clusters=k, batch_size=batch_size, n_init=3, random_state=RANDOM_STATE)
+    return model.fit_predict(X)
+
+
+def fit_hdbscan(X: np.ndarray, min_cluster_size: int = 100, min_samples: int = 30) -> np.ndarray:
+    """HDBSCAN labels; -1 marks noise points."""
+    return HDBSCAN(min_cluster_size=min_cluster_size, min_samples=min_samples).fit_predict(X)
+
+
+# ──────────────────────────────────────────────────────
+# Output
+# ──────────────────────────────────────────────────────
+def write_labels(geoids, labels, column: str, path: str = LABELS_PATH) -> pd.DataFrame:
+    """
+    Add or replace ``column`` in the GEOID-keyed labels file, keeping any
+    other cluster columns already there.
+    """
+    new = pd.DataFrame({"GEOID": pd.Series(geoids).astype(str).values, column: labels})
+    if os.path.exists(path):
+        existing = pd.read_csv(path, dtype={"GEOID": str}).drop(columns=[column], errors="ignore")
+        new = existing.merge(new, on="GEOID", how="outer")
+    new.to_csv(path, index=False)
+    return new
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cluster census tracts and write GEOID-keyed labels.")
+    parser.add_argument("input", help="CSV with GEOID, lat, lon and feature columns (e.g. final_df.csv)")
+    parser.add_argument("--embedding", choices=["none", "umap", "gae"], default="umap")
+    parser.add_argument("--k", type=int, nargs="+", default=[4, 5, 6, 7, 8], help="k values to sweep")
+    parser.add_argument("--neighbors", type=int, default=5, help="Neighbours in the haversine graph")
+    parser.add_argument("--hdbscan", action="store_true", help="Also write HDBSCAN labels")
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    parser.add_argument("--output", default=LABELS_PATH)
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.input, dtype={"GEOID": str})
+    feature_cols = default_feature_columns(df)
+    X = StandardScaler().fit_transform(df[feature_cols].fillna(0))
+
+    os.makedirs(args.cache_dir, exist_ok=True)
+    graph_path = os.path.join(args.cache_dir, f"knn_haversine_k{args.neighbors}.npz")
+    graph = haversine_knn_graph(df["lat"], df["lon"], k=args.neighbors)
+    save_graph(graph, graph_path)
+
+    if args.embedding == "umap":
+        Z = cached_embedding("umap", feature_cols, X, {}, compute_umap, args.cache_dir)
+    elif args.embedding == "gae":
+        # Keyed on the graph's contents, not its (rewritten) file path
+        Z = cached_embedding("gae", feature_cols, X, {}, partial(compute_gae, graph_path=graph_path),
+                             args.cache_dir, extra=graph_fingerprint(graph))
+    else:
+        Z = X
+
+    scores = kmeans_sweep(Z, args.k)
+    print(scores.to_string(index=False))
+    best_k = int(scores.loc[scores["silhouette"].idxmax(), "k"])
+    print(f"Best k by silhouette: {best_k}")
+
+    write_labels(df["GEOID"], fit_kmeans(Z, best_k), "kmeans_cluster", args.output)
+    if args.hdbscan:
+        write_labels(df["GEOID"], fit_hdbscan(Z), "hdbscan_cluster", args.output)
+    print(f"Labels written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""
+Parallel ingestion of the per-state TIGER cartographic boundary files
+(cb_2021_XX_tract_500k.zip) into one GeoParquet dataset partitioned by
+state FIPS code.
+
+Each state archive is read, reprojected and given centroids in its own
+worker process, then written as ``<out_dir>/STATEFP=XX/part-0.parquet``.
+Later stages read only the states they need with ``read_tracts`` /
+``read_centroids``.
+
+STATEFP is stored only in the directory names. Generic readers infer it
+as an integer ("04" -> 4), so read the dataset through the functions
+here, or pass ``partitioning=STATE_PARTITIONING`` (string key), e.g.
+``pd.read_parquet(out_dir, partitioning=STATE_PARTITIONING,
+filters=[("STATEFP", "=", "04")])`` or ``tract_dataset(out_dir)``.
+
+Usage:
+    python tract_ingest.py census_tracts tracts_parquet
+    python tract_ingest.py census_tracts tracts_parquet --states 04 06 --workers 4
+"""
+import argparse
+import glob
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import geopandas as gpd
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+from tqdm import tqdm
+
+# ──────────────────────────────────────────────────────
+# Constants
+# ──────────────────────────────────────────────────────
+TARGET_CRS = "EPSG:4326"
+AREA_CRS = "EPSG:5070"      # CONUS Albers equal-area, used for centroids
+PARTITION_KEY = "STATEFP"
+ROW_GROUP_SIZE = 20_000
+ZIP_PATTERN = re.compile(r"cb_\d{4}_(\d{2})_tract_500k\.zip$")
+
+KEEP_COLUMNS = ["GEOID", "STATEFP", "COUNTYFP", "TRACTCE", "NAMELSAD", "ALAND", "AWATER"]
+
+# Hive partitioning with STATEFP kept as a zero-padded string
+STATE_PARTITIONING = ds.partitioning(pa.schema([(PARTITION_KEY, pa.string())]), flavor="hive")
+
+
+# ──────────────────────────────────────────────────────
+# Per-state worker
+# ──────────────────────────────────────────────────────
+def find_state_zips(tracts_dir: str, states=None) -> dict:
+    """Map state FIPS -> path for every downloaded tract archive in ``tracts_dir``."""
+    found = {}
+    for path in sorted(glob.glob(os.path.join(tracts_dir, "cb_*_tract_500k.zip"))):
+        match = ZIP_PATTERN.search(os.path.basename(path))
+        if match:
+            found[match.group(1)] = path
+    if states:
+        wanted = {s.zfill(2) for s in states}
+        found = {fips: path for fips, path in found.items() if fips in wanted}
+    return found
+
+
+def ingest_state(zip_path: str, out_dir: str, row_group_size: int = ROW_GROUP_SIZE) -> tuple:
+    """
+    Read one state archive, reproject to WGS84, add centroid lat/lon and
+    write it as that state's partition. Returns (state FIPS, tract count).
+    """
+    gdf = gpd.read_file(f"zip://{zip_path}")
+    gdf = gdf[[c for c in KEEP_COLUMNS if c in gdf.columns] + ["geometry"]]
+    gdf["GEOID"] = gdf["GEOID"].astype(str)
+
+    # Centroids are taken in an equal-area CRS, then expressed in lat/lon
+    centroids = gdf.geometry.to_crs(AREA_CRS).centroid.to_crs(TARGET_CRS)
+    gdf = gdf.to_crs(TARGET_CRS)
+    gdf["lon"] = centroids.x.values
+    gdf["lat"] = centroids.y.values
+    gdf["area_sq_meters"] = gdf["ALAND"].astype(float) if "ALAND" in gdf.columns else float("nan")
+
+    state_fips = str(gdf[PARTITION_KEY].iloc[0]) if len(gdf) else ZIP_PATTERN.search(zip_path).group(1)
+    part_dir = os.path.join(out_dir, f"{PARTITION_KEY}={state_fips}")
+    os.makedirs(part_dir, exist_ok=True)
+
+    # The partition value lives only in the directory name, as with hive datasets;
+    # a string column of the same name would clash with the inferred partition field
+    gdf = gdf.drop(columns=[PARTITION_KEY]).sort_values("GEOID").reset_index(drop=True)
+    gdf.to_parquet(os.path.join(part_dir, "part-0.parquet"), index=False, row_group_size=row_group_size)
+    return state_fips, len(gdf)
+
+
+# ──────────────────────────────────────────────────────
+# National ingest
+# ──────────────────────────────────────────────────────
+def ingest_tracts(tracts_dir: str, out_dir: str, states=None, workers=None,
+                  row_group_size: int = ROW_GROUP_SIZE) -> pd.DataFrame:
+    """
+    Ingest every downloaded state archive concurrently. ``workers`` defaults
+    to the number of cores. Returns a per-state summary of tract counts.
+    """
+    zips = find_state_zips(tracts_dir, states)
+    if not zips:
+        raise FileNotFoundError(f"No cb_*_tract_500k.zip archives found in {tracts_dir}")
+    os.makedirs(out_dir, exist_ok=True)
+
+    results, failures = [], {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(ingest_state, path, out_dir, row_group_size): fips
+                   for fips, path in zips.items()}
+        for future in tqdm(as_completed(futures), total=len(futures), desc="Ingesting"):
+            fips = futures[future]
+            try:
+                results.append(future.result())
+            except Exception as e:
+                print(f"Error ingesting {fips}: {e}")
+                failures[fips] = e
+
+    if failures:
+        raise RuntimeError(f"Ingest failed for {len(failures)} state(s): {', '.join(sorted(failures))}")
+    return pd.DataFrame(results, columns=[PARTITION_KEY, "tracts"]).sort_values(PARTITION_KEY)
+
+
+def _partition_files(dataset_dir: str, states=None) -> list:
+    """(state FIPS, parquet path) pairs for the requested partitions."""
+    if states is None:
+        part_dirs = sorted(glob.glob(os.path.join(dataset_dir, f"{PARTITION_KEY}=*")))
+    else:
+        part_dirs = [os.path.join(dataset_dir, f"{PARTITION_KEY}={s.zfill(2)}") for s in states]
+
+    files = [(os.path.basename(d).split("=", 1)[1], path)
+             for d in part_dirs for path in sorted(glob.glob(os.path.join(d, "*.parquet")))]
+    if not files:
+        raise FileNotFoundError(f"No tract partitions found in {dataset_dir} for states={states}")
+    return files
+
+
+def tract_dataset(dataset_dir: str) -> ds.Dataset:
+    """The whole dataset as a pyarrow dataset with STATEFP read as a string."""
+    return ds.dataset(dataset_dir, format="parquet", partitioning=STATE_PARTITIONING)
+
+
+def read_tracts(dataset_dir: str, states=None, columns=None) -> gpd.GeoDataFrame:
+    """
+    Load tracts from the partitioned dataset. Only the partitions for
+    ``states`` (FIPS codes) are read; all states are loaded when omitted.
+    """
+    frames = []
+    for fips, path in _partition_files(dataset_dir, states):
+        part = gpd.read_parquet(path, columns=columns)
+        part[PARTITION_KEY] = fips
+        frames.append(part)
+    return gpd.GeoDataFrame(pd.concat(frames, ignore_index=True), crs=frames[0].crs)
+
+
+def read_centroids(dataset_dir: str, states=None) -> pd.DataFrame:
+    """
+    GEOID / STATEFP / lat / lon for each tract, the replacement for
+    census_tract_centroids.geojson. Polygons are not read.
+    """
+    frames = []
+    for fips, path in _partition_files(dataset_dir, states):
+        part = pd.read_parquet(path, columns=["GEOID", "lat", "lon"])
+        part[PARTITION_KEY] = fips
+        frames.append(part)
+    return pd.concat(frames, ignore_index=True)[["GEOID", PARTITION_KEY, "lat", "lon"]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest TIGER tract archives into partitioned GeoParquet.")
+    parser.add_argument("tracts_dir", help="Directory holding cb_2021_XX_tract_500k.zip files")
+    parser.add_argument("out_dir", help="Output dataset directory")
+    parser.add_argument("--states", nargs="*", help="State FIPS codes to ingest (default: all found)")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--row-group-size", type=int, default=ROW_GROUP_SIZE)
+    args = parser.parse_args()
+
+    summary = ingest_tracts(args.tracts_dir, args.out_dir, args.states, args.workers, args.row_group_size)
+    print(summary.to_string(index=False))
+    print(f"Total tracts: {summary['tracts'].sum():,}")
+
+
+if __name__ == "__main__":
+    main()
@@ -10,6 +10,9 @@ import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 from openai import OpenAI
+from utils.data_loader import read_data_version
+from utils.exports import export_widget
+from utils.figure_cache import get_figure_cache, render_figure
 
 # ──────────────────────────────────────────────────────
 # Page Config
@@ -25,12 +28,14 @@ def reset_report():
 # Data Loading
 # ──────────────────────────────────────────────────────
 @st.cache_resource(show_spinner=False)
-def load_data() -> gpd.GeoDataFrame:
+def load_data():
+    # The version is captured with the frame so cache keys match the data served
+    version = read_data_version()
     gdf = gpd.read_file("data/gdf.geojson")
     gdf["simple_geometry"] = gdf.geometry.simplify(tolerance=0.001, preserve_topology=True)
-    return gdf
+    return gdf, version
 
-gdf = load_data()
+gdf, data_version = load_data()
 cities = sorted(gdf["PlaceName"].dropna().unique().tolist(), key=lambda x: x.lower())
 
 # ──────────────────────────────────────────────────────
@@ -214,23 +219,23 @@ with t6:
         # ─────── Left column ───────
         with colA:
             # Risk Map – Uninsured-Rate choropleth
-            risk_map = px.choropleth_mapbox(
+            risk_map = get_figure_cache().choropleth(
                 city_data,
-                geojson=city_data.set_geometry("simple_geometry").geometry,
-                locations=city_data.index,
-                color="Uninsured_Rate",
-                color_continuous_scale="YlOrRd",
+                "Uninsured_Rate",
+                key=(data_version, selected_city, "report", "Uninsured_Rate"),
+                hover_col="GEOID",
+                label="Uninsured_Rate",
+                color_scale="YlOrRd",
                 zoom=9,
                 center={
                     "lon": city_data.geometry.centroid.x.mean(),
                     "lat": city_data.geometry.centroid.y.mean(),
                 },
-                mapbox_style="carto-positron",
-                hover_data=["GEOID", "Uninsured_Rate"],
+                height=350,
+                margin=dict(l=0, r=0, t=0, b=0),
             )
-            risk_map.update_layout(margin=dict(l=0, r=0, t=0, b=0), height=350)
 
-            st.plotly_chart(risk_map, use_container_width=True, key="risk_map_uninsured")
+            render_figure(risk_map, height=350)
             st.plotly_chart(fig_prev, use_container_width=True,  key="previous_trend")
 
         # ─────── Right column ───────
@@ -243,12 +248,11 @@ with t6:
         stats_df = pd.DataFrame(list(summary.items()), columns=["Metric", "Value"])
         st.dataframe(stats_df, use_container_width=True, key="stats_table")
 
-        csv_bytes = city_data.drop(columns="geometry").to_csv(index=False).encode("utf-8")
-        st.download_button(
-            "📥 Download Tract Data",
-            csv_bytes,
-            file_name=f"{selected_city.replace(' ', '_')}_tracts.csv",
-            mime="text/csv",
+        export_widget(
+            city_data,
+            key=(data_version, "city_report", selected_city),
+            file_stem=f"{selected_city.replace(' ', '_')}_tracts",
+            label="📥 Download Tract Data",
         )
     else:
         st.info("Click **Generate Full Report** to see narrative, policy, and full visuals.")
@@ -17,6 +17,8 @@ from langchain.schema import Document
 from langchain.chains import RetrievalQA
 from langchain_experimental.agents import create_pandas_dataframe_agent
 
+from utils.spatial_query import TractIndex, answer_query, AGENT_TOOL_DESCRIPTION
+
 # ────────────────────────────────────────────────────────────────
 # Streamlit config
 # ────────────────────────────────────────────────────────────────
@@ -127,11 +129,31 @@ pandas_tool = Tool(
     )
 )
 
+# ────────────────────────────────────────────────────────────────
+# 4C. Spatial tool  (point-in-tract / radius / nearest)
+# ────────────────────────────────────────────────────────────────
+@st.cache_resource
+def load_tract_index() -> TractIndex:
+    here = os.path.dirname(__file__)
+    return TractIndex.load_or_build(
+        index_path = os.path.join(here, "..", "data", "tract_index.pkl"),
+        gdf_path   = os.path.join(here, "..", "data", "gdf.geojson"),
+        gdf        = gdf,
+    )
+
+tract_index = load_tract_index()
+
+spatial_tool = Tool(
+    name="TractLocator",
+    func=lambda q: answer_query(tract_index, q),
+    description=AGENT_TOOL_DESCRIPTION,
+)
+
 # ────────────────────────────────────────────────────────────────
 # 5. Multi-tool agent
 # ────────────────────────────────────────────────────────────────
 agent = initialize_agent(
-    tools   = [rag_tool, pandas_tool],
+    tools   = [rag_tool, pandas_tool, spatial_tool],
     llm     = llm_best,
     agent   = AgentType.OPENAI_FUNCTIONS,
     verbose = True
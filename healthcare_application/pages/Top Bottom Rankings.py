@@ -1,9 +1,10 @@
 import os
 import streamlit as st
-import geopandas as gpd
 import pandas as pd
 import plotly.express as px
 from openai import OpenAI
+from utils.data_loader import get_data, get_data_version
+from utils.exports import export_widget
 
 # ───────────────────────────────────────────────────
 # Page Config
@@ -13,13 +14,9 @@ st.set_page_config(page_title="Health Equity & Risk Prioritization", layout="wid
 # ───────────────────────────────────────────────────
 # Load Data
 # ───────────────────────────────────────────────────
-if "gdf" not in st.session_state:
-    with st.spinner("Loading data..."):
-        gdf = gpd.read_file("data/gdf.geojson")
-        gdf['simple_geometry'] = gdf.geometry.simplify(tolerance=0.001, preserve_topology=True)
-        st.session_state["gdf"] = gdf
-else:
-    gdf = st.session_state["gdf"]
+# Shared loader, so the session frame always carries the cluster labels
+gdf = get_data()
+data_version = get_data_version()
 
 cities = sorted(gdf["PlaceName"].dropna().unique(), key=lambda x: x.lower())
 
@@ -122,5 +119,9 @@ except Exception as e:
     st.warning(f"Could not generate AI policy summary. ({e})")
 
 # Export
-csv = ranking_df.to_csv(index=False).encode('utf-8')
-st.download_button("🔹 Download Data", csv, "tract_rankings.csv", "text/csv")
+export_widget(
+    ranking_df,
+    key=(data_version, "rankings", selected_city, selected_metric_label, rank_type, priority_only),
+    file_stem="tract_rankings",
+    label="🔹 Download Data",
+)
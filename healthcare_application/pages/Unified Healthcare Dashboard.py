@@ -1,8 +1,9 @@
 import os
 import streamlit as st
 import geopandas as gpd
-import plotly.express as px
-from utils.data_loader import get_data
+import pandas as pd
+from utils.data_loader import get_data, get_data_version
+from utils.figure_cache import get_figure_cache, render_figure, show_cache_stats
 
 # ──────────────────────────────────────────────────────
 # Page Config
@@ -23,10 +24,12 @@ with st.sidebar:
 
     selected_city = st.selectbox("Select City", ["All Cities"] + cities)
 
-    selected_view = st.selectbox(
-        "Select View",
-        ["Facilities", "Health Outcomes", "HPSA Scores", "Social Barriers"]
-    )
+    cluster_cols = [c for c in gdf.columns if c.endswith("_cluster")]
+    views = ["Facilities", "Health Outcomes", "HPSA Scores", "Social Barriers"]
+    if cluster_cols:
+        views.append("Tract Clusters")
+
+    selected_view = st.selectbox("Select View", views)
 
     reverse_color = st.checkbox("Reverse Color Scale", value=False)
 
@@ -100,6 +103,12 @@ def select_social_barrier_view():
     filtered_gdf["value"] = filtered_gdf[barrier_cols[selected]]
     return selected
 
+def select_cluster_view():
+    with st.sidebar:
+        selected = st.selectbox("Clustering", cluster_cols)
+    filtered_gdf["value"] = filtered_gdf[selected]
+    return selected.replace("_", " ").title()
+
 # ──────────────────────────────────────────────────────
 # Main Page Title
 # ──────────────────────────────────────────────────────
@@ -122,6 +131,8 @@ elif selected_view == "HPSA Scores":
     label, filtered_gdf = select_hpsa_score_view()
 elif selected_view == "Social Barriers":
     label = select_social_barrier_view()
+elif selected_view == "Tract Clusters":
+    label = select_cluster_view()
 
 # ──────────────────────────────────────────────────────
 # Handle Missing Values
@@ -137,12 +148,22 @@ if filtered_gdf.empty:
 # ──────────────────────────────────────────────────────
 st.subheader(f"{label} in {selected_city}")
 
-col1, col2, col3, col4 = st.columns(4)
+is_categorical = selected_view == "Tract Clusters"
 
-col1.metric("Average", f"{filtered_gdf['value'].mean():.2f}")
-col2.metric("Median", f"{filtered_gdf['value'].median():.2f}")
-col3.metric("Min", f"{filtered_gdf['value'].min():.2f}")
-col4.metric("Max", f"{filtered_gdf['value'].max():.2f}")
+if is_categorical:
+    # Cluster IDs are labels, so show tract counts per cluster instead of averages
+    counts = filtered_gdf["value"].astype(int).value_counts().sort_index()
+    st.dataframe(pd.DataFrame({
+        "Cluster": ["Noise" if c == -1 else f"Cluster {c}" for c in counts.index],
+        "Tracts": counts.values,
+    }), hide_index=True, use_container_width=True)
+else:
+    col1, col2, col3, col4 = st.columns(4)
+
+    col1.metric("Average", f"{filtered_gdf['value'].mean():.2f}")
+    col2.metric("Median", f"{filtered_gdf['value'].median():.2f}")
+    col3.metric("Min", f"{filtered_gdf['value'].min():.2f}")
+    col4.metric("Max", f"{filtered_gdf['value'].max():.2f}")
 
 # ──────────────────────────────────────────────────────
 # Helper: Map Center & Zoom
@@ -161,24 +182,18 @@ center, zoom = get_center_zoom(filtered_gdf.geometry)
 # ──────────────────────────────────────────────────────
 color_scale = "RdYlGn_r" if reverse_color else "YlOrRd"
 
-fig = px.choropleth_mapbox(
+fig = get_figure_cache().choropleth(
     filtered_gdf,
-    geojson=filtered_gdf.set_geometry("simple_geometry").geometry,
-    locations=filtered_gdf.index,
-    color="value",
-    color_continuous_scale=color_scale,
-    custom_data=["Geography", "value"],
+    "value",
+    key=(get_data_version(), selected_city, selected_view, label),
+    hover_col="Geography",
+    label=label,
+    color_scale=color_scale,
     center=center,
     zoom=zoom,
-    mapbox_style="carto-positron",
-    labels={"value": label},
-    title=f"{label} by Census Tract"
-)
-
-fig.update_layout(margin=dict(l=0, r=0, t=50, b=0), height=750, uirevision="static")
-fig.update_traces(
-    marker_line_width=1,
-    hovertemplate=f"<b>%{{customdata[0]}}</b><br>{label}: %{{customdata[1]:.2f}}<extra></extra>"
+    title=f"{label} by Census Tract",
+    categorical=is_categorical,
 )
 
-st.plotly_chart(fig, use_container_width=True)
+render_figure(fig)
+show_cache_stats(get_figure_cache())
@@ -1,10 +1,39 @@
+import os
 import geopandas as gpd
+import pandas as pd
 import streamlit as st
 
+GDF_PATH = "data/gdf.geojson"
+CLUSTERS_PATH = "data/tract_clusters.csv"
+
+def read_data_version():
+    # Changes whenever one of the input files is rewritten. Read it before
+    # loading and keep it with the loaded frame, not at render time.
+    return tuple(os.path.getmtime(p) if os.path.exists(p) else None for p in (GDF_PATH, CLUSTERS_PATH))
+
+def load_cluster_labels(gdf):
+    # Merge GEOID-keyed cluster labels written by analysis/scripts/tract_clustering.py
+    if not os.path.exists(CLUSTERS_PATH):
+        return gdf
+    labels = pd.read_csv(CLUSTERS_PATH, dtype={"GEOID": str})
+    labels = labels.drop(columns=[c for c in labels.columns if c != "GEOID" and c in gdf.columns])
+    labels["GEOID"] = labels["GEOID"].str.zfill(11)
+    key = gdf["GEOID"].astype(str).str.zfill(11)
+    merged = gdf.assign(_geoid=key).merge(labels.rename(columns={"GEOID": "_geoid"}), on="_geoid", how="left")
+    return merged.drop(columns="_geoid")
+
 def get_data():
     if "gdf" not in st.session_state:
         with st.spinner("Loading map data..."):
-            gdf = gpd.read_file("data/gdf.geojson")
+            version = read_data_version()
+            gdf = gpd.read_file(GDF_PATH)
+            gdf = load_cluster_labels(gdf)
             gdf['simple_geometry'] = gdf.geometry.simplify(tolerance=0.001, preserve_topology=True)
+            st.session_state["data_version"] = version
             st.session_state["gdf"] = gdf
-    return st.session_state["gdf"]
\ No newline at end of file
+    return st.session_state["gdf"]
+
+def get_data_version():
+    # Version of the frame get_data() serves this session; use it in cache keys
+    get_data()
+    return st.session_state["data_version"]
@@ -0,0 +1,126 @@
+import io
+import threading
+from collections import OrderedDict
+
+import geopandas as gpd
+import pandas as pd
+import streamlit as st
+
+MAX_CACHE_BYTES = 256 * 1024 * 1024
+
+FORMATS = {
+    "CSV": ("csv", "text/csv"),
+    "Parquet": ("parquet", "application/vnd.apache.parquet"),
+    "GeoJSON": ("geojson", "application/geo+json"),
+}
+
+# ──────────────────────────────────────────────────────
+# Size-bounded byte cache (shared across sessions)
+# ──────────────────────────────────────────────────────
+class ExportCache:
+    """LRU cache of serialized exports, evicting oldest entries past max_bytes."""
+
+    def __init__(self, max_bytes=MAX_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            self._items.move_to_end(key)
+            return item[0]
+
+    def put(self, key, data, size=None):
+        # size defaults to len(data); pass an estimate for non-bytes values
+        size = len(data) if size is None else size
+        if size > self.max_bytes:
+            return data         # too large to keep, serve it once
+        with self._lock:
+            if key in self._items:
+                self.size -= self._items.pop(key)[1]
+            self._items[key] = (data, size)
+            self.size += size
+            while self.size > self.max_bytes:
+                _, (_, old_size) = self._items.popitem(last=False)
+                self.size -= old_size
+        return data
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._items
+
+
+@st.cache_resource(show_spinner=False)
+def get_export_cache() -> ExportCache:
+    return ExportCache()
+
+# ──────────────────────────────────────────────────────
+# Serializers
+# ──────────────────────────────────────────────────────
+# st.download_button needs the complete payload in memory, so each format
+# is written in one pass; the saving comes from building it only on
+# request and caching the result.
+def _geometry_columns(df):
+    return [c for c in df.columns if isinstance(df[c].dtype, gpd.array.GeometryDtype)]
+
+def _tabular(df):
+    # CSV / Parquet exports carry attributes only
+    return pd.DataFrame(df.drop(columns=_geometry_columns(df)))
+
+def to_csv_bytes(df):
+    return _tabular(df).to_csv(index=False).encode("utf-8")
+
+def to_parquet_bytes(df):
+    buf = io.BytesIO()
+    _tabular(df).to_parquet(buf, index=False)
+    return buf.getvalue()
+
+def to_geojson_bytes(gdf, geometry="geometry"):
+    others = [c for c in _geometry_columns(gdf) if c != geometry]
+    gdf = gdf.drop(columns=others).set_geometry(geometry).to_crs(epsg=4326)
+    return gdf.to_json(drop_id=True).encode("utf-8")
+
+SERIALIZERS = {"CSV": to_csv_bytes, "Parquet": to_parquet_bytes, "GeoJSON": to_geojson_bytes}
+
+def available_formats(df):
+    formats = ["CSV", "Parquet"]
+    if isinstance(df, gpd.GeoDataFrame) and "geometry" in df.columns:
+        formats.append("GeoJSON")
+    return formats
+
+def export_bytes(df, key, fmt):
+    """Serialized export for a selection key, built on the first request only."""
+    cache = get_export_cache()
+    cache_key = (key, fmt)
+    data = cache.get(cache_key)
+    if data is None:
+        data = cache.put(cache_key, SERIALIZERS[fmt](df))
+    return data
+
+# ──────────────────────────────────────────────────────
+# Streamlit widget
+# ──────────────────────────────────────────────────────
+def export_widget(df, key, file_stem, label="📥 Download Data"):
+    """
+    Format picker plus download button. Nothing is serialized until the
+    user asks for it; once built, the bytes are reused for the same
+    selection key across reruns and sessions. The cache is process-wide,
+    so ``key`` should start with the version captured when ``df``'s
+    source frame was loaded (data_loader.get_data_version()).
+    """
+    widget_id = "export_" + "_".join(str(k) for k in key)
+    col_fmt, col_btn = st.columns([1, 2])
+    fmt = col_fmt.selectbox("Format", available_formats(df), key=f"{widget_id}_fmt",
+                            label_visibility="collapsed")
+    ext, mime = FORMATS[fmt]
+
+    with col_btn:
+        if (key, fmt) not in get_export_cache() and not st.button(f"Prepare {fmt}", key=f"{widget_id}_prep"):
+            return
+        with st.spinner(f"Preparing {fmt} …"):
+            data = export_bytes(df, key, fmt)
+        st.download_button(label, data, file_name=f"{file_stem}.{ext}", mime=mime, key=f"{widget_id}_dl")
@@ -0,0 +1,196 @@
+import logging
+import threading
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+import plotly.io as pio
+import shapely
+import streamlit as st
+import streamlit.components.v1 as components
+from plotly.colors import qualitative
+
+from utils.exports import ExportCache
+
+MAX_CACHE_BYTES = 512 * 1024 * 1024
+BYTES_PER_COORD = 64        # rough in-memory cost of one [x, y] pair in nested lists
+BYTES_PER_VALUE = 48
+
+CATEGORY_COLORS = qualitative.Plotly + qualitative.Alphabet
+NOISE_LABEL = -1            # HDBSCAN noise
+NOISE_COLOR = "#bdbdbd"
+
+logger = logging.getLogger(__name__)
+
+# ──────────────────────────────────────────────────────
+# Shared figure cache
+# ──────────────────────────────────────────────────────
+class FigureCache:
+    """
+    Three layers of figure parts shared by every session:
+
+    * geometry – GeoJSON FeatureCollection dict for a set of tract rows
+    * values   – locations / z / hover arrays for a metric selection
+    * figure   – the rendered Plotly HTML built from the two layers above
+
+    A colour-scale change misses only the figure layer, which reuses the
+    cached geometry and value dicts as-is. The figure is validated and
+    serialized once on a miss; hits hand the stored HTML to plotly.js
+    via render_figure without building or encoding a go.Figure again.
+    """
+
+    def __init__(self, max_bytes=MAX_CACHE_BYTES):
+        self._lru = ExportCache(max_bytes)
+        self._lock = threading.Lock()
+        self.hits = {"geometry": 0, "values": 0, "figure": 0}
+        self.misses = {"geometry": 0, "values": 0, "figure": 0}
+
+    def _get_or_build(self, kind, key, build):
+        entry = self._lru.get((kind,) + key)
+        with self._lock:
+            (self.hits if entry is not None else self.misses)[kind] += 1
+        if entry is None:
+            entry = build()
+            self._lru.put((kind,) + key, entry, size=entry[1])
+            logger.info("figure cache miss (%s): %s", kind, self.stats())
+        return entry
+
+    def stats(self):
+        with self._lock:
+            hits, misses = dict(self.hits), dict(self.misses)
+        total = sum(hits.values()) + sum(misses.values())
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(sum(hits.values()) / total, 3) if total else None,
+            "bytes": self._lru.size,
+            "max_bytes": self._lru.max_bytes,
+        }
+
+    def choropleth(self, gdf, value_col, key, *, hover_col, label, color_scale, center, zoom,
+                   title=None, height=750, margin=None, geometry_col="simple_geometry",
+                   categorical=False):
+        """
+        Cached equivalent of px.choropleth_mapbox for ``gdf[value_col]``,
+        returned as an HTML snippet for render_figure. ``key`` must start
+        with (data version, city, ...) and identify the whole selection
+        (view, metric, normalization); the row set is fingerprinted
+        automatically. With ``categorical`` the values are treated as
+        labels (e.g. cluster IDs): one colour per label, no colour scale,
+        and -1 drawn in grey as noise.
+        """
+        rows = rows_fingerprint(gdf)
+        geo_key = key[:2] + (rows,)             # (data version, city, rows)
+        values_key = key + (rows,)
+
+        def build_geometry():
+            geoms = gdf.set_geometry(geometry_col).geometry
+            features = [
+                {"type": "Feature", "id": str(idx), "properties": {}, "geometry": geom.__geo_interface__}
+                for idx, geom in zip(geoms.index, geoms) if geom is not None
+            ]
+            size = int(shapely.get_num_coordinates(geoms.values).sum()) * BYTES_PER_COORD
+            return {"type": "FeatureCollection", "features": features}, size
+
+        def build_values():
+            values = gdf[value_col].astype(float)
+            z = [None if np.isnan(v) else v for v in values.tolist()]
+            return {
+                "locations": [str(i) for i in gdf.index],
+                "z": z,
+                "customdata": [[str(h), v] for h, v in zip(gdf[hover_col], z)],
+            }, len(gdf) * 4 * BYTES_PER_VALUE
+
+        def build_figure():
+            geometry, geo_size = self._get_or_build("geometry", geo_key, build_geometry)
+            values, values_size = self._get_or_build("values", values_key, build_values)
+            if categorical:
+                traces = _category_traces(geometry, values, label)
+            else:
+                traces = [{
+                    "type": "choroplethmapbox",
+                    "geojson": geometry,
+                    **values,
+                    "colorscale": color_scale,
+                    "colorbar": {"title": {"text": label}},
+                    "marker": {"line": {"width": 1}},
+                    "hovertemplate": f"<b>%{{customdata[0]}}</b><br>{label}: %{{customdata[1]:.2f}}<extra></extra>",
+                }]
+            layout = {
+                "mapbox": {"style": "carto-positron", "center": center, "zoom": zoom},
+                "title": {"text": title},
+                "margin": margin or dict(l=0, r=0, t=50, b=0),
+                "height": height,
+                "uirevision": "static",
+            }
+            if categorical:
+                layout["legend"] = {"title": {"text": label}}
+            # Validated once here; the serialized HTML is what gets cached
+            fig = go.Figure({"data": traces, "layout": layout})
+            html = pio.to_html(fig, include_plotlyjs="cdn", full_html=False, config={"responsive": True},
+                               default_width="100%", default_height=f"{height}px")
+            return html, len(html)
+
+        fig_key = key + (rows, None if categorical else color_scale, label, title, height, categorical)
+        return self._get_or_build("figure", fig_key, build_figure)[0]
+
+
+def _category_traces(geometry, values, label):
+    """One single-colour trace per label so each category gets a legend entry."""
+    by_label = {}
+    for loc, z, custom in zip(values["locations"], values["z"], values["customdata"]):
+        if z is not None:
+            by_label.setdefault(int(z), ([], []))
+            by_label[int(z)][0].append(loc)
+            by_label[int(z)][1].append(custom)
+
+    traces = []
+    others = sorted(c for c in by_label if c != NOISE_LABEL)
+    for cat in others + ([NOISE_LABEL] if NOISE_LABEL in by_label else []):
+        locations, customdata = by_label[cat]
+        color = NOISE_COLOR if cat == NOISE_LABEL else CATEGORY_COLORS[others.index(cat) % len(CATEGORY_COLORS)]
+        name = "Noise" if cat == NOISE_LABEL else f"Cluster {cat}"
+        traces.append({
+            "type": "choroplethmapbox",
+            "geojson": geometry,
+            "locations": locations,
+            "z": [0] * len(locations),
+            "customdata": customdata,
+            "colorscale": [[0, color], [1, color]],
+            "showscale": False,
+            "showlegend": True,
+            "name": name,
+            "marker": {"line": {"width": 1}},
+            "hovertemplate": f"<b>%{{customdata[0]}}</b><br>{label}: {name}<extra></extra>",
+        })
+    return traces
+
+
+def rows_fingerprint(df):
+    """Cheap, order-independent identity for the set of rows in a frame."""
+    return int(pd.util.hash_array(np.asarray(df.index)).sum()) ^ len(df)
+
+
+def render_figure(html, height=750):
+    """
+    Show a cached figure from FigureCache. Unlike st.plotly_chart this
+    passes the stored HTML through as-is, so nothing is re-validated or
+    re-encoded on a cache hit.
+    """
+    components.html(html, height=height)
+
+
+@st.cache_resource(show_spinner=False)
+def get_figure_cache() -> FigureCache:
+    return FigureCache()
+
+
+def show_cache_stats(cache: FigureCache):
+    """Sidebar expander with the shared figure cache's hit/miss counters."""
+    stats = cache.stats()
+    with st.sidebar.expander("Map cache"):
+        st.caption(
+            f"Hit rate: {stats['hit_rate'] if stats['hit_rate'] is not None else 'n/a'} · "
+            f"{stats['bytes'] / 1e6:.1f} / {stats['max_bytes'] / 1e6:.0f} MB"
+        )
+        st.dataframe(pd.DataFrame({"hits": stats["hits"], "misses": stats["misses"]}), use_container_width=True)
@@ -0,0 +1,258 @@
+"""
+Point-to-tract and radius queries over an STRtree of tract polygons.
+
+Python API:
+    index = TractIndex.load_or_build("data/tract_index.pkl", "data/gdf.geojson")
+    index.locate(lats, lons)               # batch point-in-polygon
+    index.within_radius(lat, lon, 10)      # tracts within 10 km
+    index.nearest(lat, lon, k=5)           # k nearest tracts
+    answer_query(index, "<address or lat, lon> radius_km=10")   # Q&A agent tool, geocodes addresses
+
+CLI (run from healthcare_application/):
+    python -m utils.spatial_query locate points.csv -o points_with_tracts.csv
+    python -m utils.spatial_query within points.csv --radius-km 10
+    python -m utils.spatial_query nearest points.csv -k 5
+"""
+import argparse
+import logging
+import os
+import pickle
+import re
+from functools import lru_cache
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import requests
+import shapely
+from shapely import STRtree
+
+GDF_PATH = "data/gdf.geojson"
+INDEX_PATH = "data/tract_index.pkl"
+KM_PER_DEG_LAT = 111.32
+GEOCODER_URL = "https://geocoding.geo.census.gov/geocoder/locations/onelineaddress"
+ATTR_COLUMNS = ["GEOID", "PlaceName", "StateAbbr"]
+
+logger = logging.getLogger(__name__)
+
+
+class TractIndex:
+    """Packed STRtree over tract polygons (EPSG:4326) plus their GEOID/place attributes."""
+
+    def __init__(self, geometries, attrs: pd.DataFrame):
+        self.geometries = np.asarray(geometries, dtype=object)
+        self.attrs = attrs.reset_index(drop=True)
+        self.tree = STRtree(self.geometries)
+
+    # ── construction / persistence ───────────────────
+    @classmethod
+    def from_gdf(cls, gdf: gpd.GeoDataFrame):
+        gdf = gdf.to_crs(epsg=4326) if gdf.crs is not None else gdf
+        gdf = gdf[gdf.geometry.notna() & ~gdf.geometry.is_empty]
+        attrs = pd.DataFrame(gdf[[c for c in ATTR_COLUMNS if c in gdf.columns]])
+        attrs["GEOID"] = attrs["GEOID"].astype(str)
+        return cls(gdf.geometry.values, attrs)
+
+    def save(self, path: str):
+        with open(path, "wb") as f:
+            pickle.dump({"wkb": shapely.to_wkb(self.geometries), "attrs": self.attrs}, f)
+
+    @classmethod
+    def load(cls, path: str):
+        with open(path, "rb") as f:
+            data = pickle.load(f)
+        return cls(shapely.from_wkb(data["wkb"]), data["attrs"])
+
+    @classmethod
+    def load_or_build(cls, index_path: str = INDEX_PATH, gdf_path: str = GDF_PATH, gdf=None):
+        """Load the persisted index, rebuilding it when the tract file is newer."""
+        if os.path.exists(index_path) and os.path.getmtime(index_path) >= os.path.getmtime(gdf_path):
+            return cls.load(index_path)
+        index = cls.from_gdf(gdf if gdf is not None else gpd.read_file(gdf_path))
+        try:
+            index.save(index_path)
+        except OSError as err:
+            # e.g. a read-only data/ directory; the in-memory index still works
+            logger.warning("Could not persist tract index to %s: %s", index_path, err)
+        return index
+
+    # ── queries ──────────────────────────────────────
+    def locate(self, lats, lons) -> pd.DataFrame:
+        """
+        Tract containing each point, in one vectorized tree query.
+        Points outside every tract get a missing GEOID.
+        """
+        points = shapely.points(np.asarray(lons, dtype=float), np.asarray(lats, dtype=float))
+        point_idx, tract_idx = self.tree.query(points, predicate="intersects")
+
+        # A point on a shared boundary matches several tracts; keep the first
+        first = np.unique(point_idx, return_index=True)[1]
+        hits = pd.Series(tract_idx[first], index=point_idx[first])
+
+        out = pd.DataFrame(index=range(len(points)), columns=self.attrs.columns, dtype=object)
+        out.loc[hits.index, :] = self.attrs.iloc[hits.values].values
+        return out
+
+    def _distances_km(self, lat: float, lon: float, tract_idx: np.ndarray) -> np.ndarray:
+        # Local equirectangular projection around the query point
+        kx = KM_PER_DEG_LAT * np.cos(np.radians(lat))
+        local = shapely.transform(
+            self.geometries[tract_idx],
+            lambda xy: np.column_stack([(xy[:, 0] - lon) * kx, (xy[:, 1] - lat) * KM_PER_DEG_LAT]),
+        )
+        return shapely.distance(local, shapely.points(0.0, 0.0))
+
+    def _candidates(self, lat: float, lon: float, radius_km: float) -> np.ndarray:
+        dlat = radius_km / KM_PER_DEG_LAT
+        dlon = radius_km / (KM_PER_DEG_LAT * max(np.cos(np.radians(lat)), 1e-6))
+        return self.tree.query(shapely.box(lon - dlon, lat - dlat, lon + dlon, lat + dlat))
+
+    def within_radius(self, lat: float, lon: float, radius_km: float) -> pd.DataFrame:
+        """Tracts whose polygon lies within ``radius_km`` of the point, nearest first."""
+        idx = self._candidates(lat, lon, radius_km)
+        dist = self._distances_km(lat, lon, idx)
+        keep = dist <= radius_km
+        return self._result(idx[keep], dist[keep])
+
+    def nearest(self, lat: float, lon: float, k: int = 5, start_km: float = 2.0,
+                max_km: float = 500.0) -> pd.DataFrame:
+        """The ``k`` tracts closest to the point (0 km for the containing tract)."""
+        radius = start_km
+        while True:
+            idx = self._candidates(lat, lon, radius)
+            dist = self._distances_km(lat, lon, idx)
+            keep = dist <= radius
+            if keep.sum() >= k or radius >= max_km:
+                idx, dist = idx[keep], dist[keep]
+                order = np.argsort(dist, kind="stable")[:k]
+                return self._result(idx[order], dist[order])
+            radius *= 2
+
+    def _result(self, tract_idx, dist) -> pd.DataFrame:
+        out = self.attrs.iloc[tract_idx].reset_index(drop=True)
+        out["distance_km"] = np.round(dist, 3)
+        return out.sort_values("distance_km", kind="stable").reset_index(drop=True)
+
+
+# ──────────────────────────────────────────────────────
+# Q&A agent tool
+# ──────────────────────────────────────────────────────
+COORD_REGEX = re.compile(r"\(?\s*(-?\d+(?:\.\d+)?)\s*,\s*(-?\d+(?:\.\d+)?)\s*\)?")
+RADIUS_REGEX = re.compile(r"radius(?:_km)?\s*=\s*(\d+(?:\.\d+)?)")
+K_REGEX = re.compile(r"\bk\s*=\s*(\d+)")
+
+AGENT_TOOL_DESCRIPTION = (
+    "Find census tracts by location. Input is either 'lat, lon' (decimal degrees) or a U.S. street "
+    "address, optionally followed by 'radius_km=<km>' for all tracts within that distance or "
+    "'k=<n>' for the n nearest tracts. With no option it returns the tract containing the point. "
+    "Addresses are geocoded by this tool (U.S. Census geocoder); pass the address exactly as the "
+    "user wrote it and never make up coordinates. If the tool cannot geocode an address, ask the "
+    "user for a fuller address or its coordinates. "
+    "Example inputs: '32.2226, -110.9747' • '1600 Pennsylvania Ave NW, Washington, DC radius_km=10' "
+    "• '40.71, -74.0 k=5'."
+)
+
+
+@lru_cache(maxsize=1024)
+def geocode_address(address: str):
+    """(lat, lon, matched address) from the U.S. Census geocoder, or None when there is no match."""
+    resp = requests.get(
+        GEOCODER_URL,
+        params={"address": address, "benchmark": "Public_AR_Current", "format": "json"},
+        timeout=10,
+    )
+    resp.raise_for_status()
+    matches = resp.json().get("result", {}).get("addressMatches", [])
+    if not matches:
+        return None
+    coords = matches[0]["coordinates"]
+    return float(coords["y"]), float(coords["x"]), matches[0].get("matchedAddress", address)
+
+
+def answer_query(index: TractIndex, text: str) -> str:
+    """Parse an agent tool input (coordinates or an address) and return a markdown table."""
+    radius = RADIUS_REGEX.search(text)
+    k = K_REGEX.search(text)
+
+    # Whole input must be coordinates, so "Suite 5, 100 Main St" is geocoded as an address
+    location = K_REGEX.sub("", RADIUS_REGEX.sub("", text)).strip(" ,;")
+    coords = COORD_REGEX.fullmatch(location)
+    if coords:
+        lat, lon = float(coords.group(1)), float(coords.group(2))
+        where = f"({lat}, {lon})"
+    else:
+        address = location
+        if not address:
+            return "Please provide an address or coordinates as 'lat, lon'."
+        try:
+            match = geocode_address(address)
+        except requests.RequestException as err:
+            return f"Geocoding is unavailable ({err}). Please ask the user for the coordinates as 'lat, lon'."
+        if match is None:
+            return (f"Could not geocode '{address}'. Please ask the user for a fuller address "
+                    "or the coordinates as 'lat, lon'.")
+        lat, lon, matched = match
+        where = f"{matched} ({lat:.5f}, {lon:.5f})"
+
+    if radius:
+        result = index.within_radius(lat, lon, float(radius.group(1)))
+    elif k:
+        result = index.nearest(lat, lon, int(k.group(1)))
+    else:
+        result = index.locate([lat], [lon]).dropna(subset=["GEOID"])
+
+    if result.empty:
+        return f"No census tracts found for {where}."
+    return f"Location: {where}\n\n" + result.to_markdown(index=False)
+
+
+# ──────────────────────────────────────────────────────
+# CLI
+# ──────────────────────────────────────────────────────
+def _per_point(points: pd.DataFrame, lat_col: str, lon_col: str, query) -> pd.DataFrame:
+    frames = []
+    for i, (lat, lon) in enumerate(zip(points[lat_col], points[lon_col])):
+        res = query(lat, lon)
+        res.insert(0, "point_index", i)
+        frames.append(res)
+    hits = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=["point_index"])
+    # Left merge keeps points with no tract in range, with empty tract columns
+    points = points.reset_index(drop=True).assign(point_index=range(len(points)))
+    return points.merge(hits, on="point_index", how="left").drop(columns="point_index")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Spatial queries of geocoded points against census tracts.")
+    parser.add_argument("command", choices=["locate", "within", "nearest"])
+    parser.add_argument("points", help="CSV with latitude/longitude columns")
+    parser.add_argument("--lat-col", default="lat")
+    parser.add_argument("--lon-col", default="lon")
+    parser.add_argument("--radius-km", type=float, default=10.0, help="Radius for 'within'")
+    parser.add_argument("-k", type=int, default=5, help="Tract count for 'nearest'")
+    parser.add_argument("--tracts", default=GDF_PATH)
+    parser.add_argument("--index", default=INDEX_PATH)
+    parser.add_argument("-o", "--output", help="Output CSV (default: stdout)")
+    args = parser.parse_args()
+
+    index = TractIndex.load_or_build(args.index, args.tracts)
+    points = pd.read_csv(args.points)
+
+    if args.command == "locate":
+        found = index.locate(points[args.lat_col], points[args.lon_col])
+        result = pd.concat([points.reset_index(drop=True), found], axis=1)
+    elif args.command == "within":
+        result = _per_point(points, args.lat_col, args.lon_col,
+                            lambda lat, lon: index.within_radius(lat, lon, args.radius_km))
+    else:
+        result = _per_point(points, args.lat_col, args.lon_col,
+                            lambda lat, lon: index.nearest(lat, lon, args.k))
+
+    if args.output:
+        result.to_csv(args.output, index=False)
+        print(f"Wrote {len(result):,} rows to {args.output}")
+    else:
+        print(result.to_csv(index=False), end="")
+
+
+if __name__ == "__main__":
+    main()